@@ -23,24 +23,28 @@ Optional env vars:
 """
 
 import os
+import asyncio
+import heapq
 import json
 import re
 import ast
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple
 
-from openai import OpenAI
-import tiktoken
+import orjson
 
 from notion_api import (
     query_top_draft_sources,
-    get_prop_text,
-    get_prop_url,
+    prop_text,
+    prop_url,
     create_content_queue_page,
     set_content_queue_properties,
     append_section,
     find_content_queue_page_for_week,
 )
+from utils import find_keywords_many, get_encoder, truncate_to_tokens
+from llm_client import client
 
 MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 MAX_INPUT_TOKENS = int(os.environ.get("MAX_INPUT_TOKENS", "9000"))
@@ -48,8 +52,6 @@ MAX_OUTPUT_TOKENS = int(os.environ.get("MAX_OUTPUT_TOKENS", "3200"))
 LOOKBACK_DAYS = int(os.environ.get("LOOKBACK_DAYS", "14"))
 MAX_SOURCES = int(os.environ.get("MAX_SOURCES", "8"))
 
-client = OpenAI()
-
 # ------------------------
 # Topic rotation (editable)
 # ------------------------
@@ -81,11 +83,8 @@ TOPIC_ROTATION: List[Dict[str, Any]] = [
     },
 ]
 
-
-def truncate_to_tokens(text: str, limit: int) -> str:
-    enc = tiktoken.encoding_for_model(MODEL)
-    toks = enc.encode(text)
-    return enc.decode(toks[:limit])
+for _t in TOPIC_ROTATION:
+    _t["keywords_lower"] = tuple(k.lower() for k in _t["keywords"])
 
 
 def monday_week_of_iso(now_utc: datetime) -> str:
@@ -94,19 +93,24 @@ def monday_week_of_iso(now_utc: datetime) -> str:
     return monday.date().isoformat()
 
 
-def pick_topic_for_week(week_of_iso: str) -> Dict[str, Any]:
-    # Deterministic rotation by ISO week number
-    dt = datetime.fromisoformat(week_of_iso).date()
-    iso_week = dt.isocalendar().week
+def pick_topic_for_week(day: date) -> Dict[str, Any]:
+    # Deterministic rotation by ISO week number (any day of the week gives the same week)
+    iso_week = day.isocalendar().week
     idx = iso_week % len(TOPIC_ROTATION)
     return TOPIC_ROTATION[idx]
 
 
+_FENCE_OPEN = re.compile(r"^```[a-zA-Z]*\s*")
+_FENCE_CLOSE = re.compile(r"\s*```$")
+_JSON_OBJ = re.compile(r"\{.*\}", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
 def extract_json(raw: str) -> Dict[str, Any]:
     """
     Robust extraction:
     1) Strip code fences
-    2) Try strict json.loads
+    2) Try strict orjson.loads (fast path), then json.loads
     3) Extract first {...} and try again
     4) Repair common JSON issues (trailing commas)
     5) Final fallback: parse as Python literal (single quotes, etc.)
@@ -117,17 +121,21 @@ def extract_json(raw: str) -> Dict[str, Any]:
 
     # Strip code fences if present
     if raw.startswith("```"):
-        raw = re.sub(r"^```[a-zA-Z]*\s*", "", raw)
-        raw = re.sub(r"\s*```$", "", raw).strip()
+        raw = _FENCE_OPEN.sub("", raw)
+        raw = _FENCE_CLOSE.sub("", raw).strip()
 
     # 1) strict parse
+    try:
+        return orjson.loads(raw)
+    except Exception:
+        pass
     try:
         return json.loads(raw)
     except Exception:
         pass
 
     # 2) first object
-    m = re.search(r"\{.*\}", raw, flags=re.DOTALL)
+    m = _JSON_OBJ.search(raw)
     if not m:
         raise ValueError("No JSON object found in response")
     candidate = m.group(0)
@@ -139,7 +147,7 @@ def extract_json(raw: str) -> Dict[str, Any]:
         pass
 
     # 4) repair trailing commas
-    repaired = re.sub(r",\s*([}\]])", r"\1", candidate)
+    repaired = _TRAILING_COMMA.sub(r"\1", candidate)
     try:
         return json.loads(repaired)
     except Exception:
@@ -152,32 +160,19 @@ def extract_json(raw: str) -> Dict[str, Any]:
     return obj
 
 
-def score_source_for_topic(title: str, summary: str, claims: str, topic_keywords: List[str]) -> float:
+def score_sources_for_topic(
+    titles: List[str], summaries: List[str], claims: List[str], topic_keywords: List[str]
+) -> List[float]:
     """
-    Lightweight topical affinity score (free).
+    Lightweight topical affinity score (free) for each source: the number of
+    topic keywords in its title, summary and claims, in one keyword sweep.
     """
-    text = (title + "\n" + summary + "\n" + claims).lower()
-    hits = sum(1 for kw in topic_keywords if kw.lower() in text)
-    return float(hits)
+    texts = [t + "\n" + s + "\n" + k for t, s, k in zip(titles, summaries, claims)]
+    return [float(len(hits)) for hits in find_keywords_many(texts, topic_keywords)]
 
 
-def llm_build_weekly_package(topic: Dict[str, Any], sources: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """
-    One LLM call for the whole weekly package.
-    Uses only Title/URL/Summary/Key Claims (cheap + citeable).
-    """
-    compiled: List[Dict[str, str]] = []
-    for s in sources:
-        compiled.append(
-            {
-                "title": get_prop_text(s, "Title"),
-                "url": get_prop_url(s, "URL"),
-                "summary": get_prop_text(s, "Summary"),
-                "key_claims": get_prop_text(s, "Key Claims"),
-            }
-        )
-
-    prompt = f"""
+# Everything in the user prompt ahead of the sources JSON
+_PROMPT_HEAD = """
 Return ONLY valid JSON with keys:
 - article_title: string
 - thesis_angle: string (1-2 sentences)
@@ -186,8 +181,8 @@ Return ONLY valid JSON with keys:
 - comment_prompts: array of 5 strings (each 1-2 sentences, high-signal questions)
 - sources: array of objects: {{title, url}}
 
-Topic for this week: {topic["name"]}
-Thesis guidance: {topic["angle"]}
+Topic for this week: {topic_name}
+Thesis guidance: {topic_angle}
 
 Tone:
 - Operational modernization + AI transformation leader
@@ -201,15 +196,52 @@ Rules:
 - No markdown fences. No backticks. JSON only.
 
 Provided sources (use ONLY these URLs):
-{json.dumps(compiled, ensure_ascii=False)}
-""".strip()
+""".lstrip()
+
+
+@lru_cache(maxsize=16)
+def _head_token_count(head: str) -> int:
+    return len(get_encoder(MODEL).encode_ordinary(head))
+
+
+def source_fields(page: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Everything the builder reads from a research row, in one pass over its properties.
+    """
+    props = page.get("properties", {})
+    return {
+        "title": prop_text(props.get("Title", {})),
+        "url": prop_url(props.get("URL", {})),
+        "summary": prop_text(props.get("Summary", {})),
+        "key_claims": prop_text(props.get("Key Claims", {})),
+        "usefulness": (props.get("Usefulness Score") or {}).get("number") or 0.0,
+    }
+
+
+async def llm_build_weekly_package(topic: Dict[str, Any], sources: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    One LLM call for the whole weekly package.
+    Uses only Title/URL/Summary/Key Claims (cheap + citeable).
+    `sources` are source_fields() dicts.
+    """
+    compiled: List[Dict[str, str]] = [
+        {"title": s["title"], "url": s["url"], "summary": s["summary"], "key_claims": s["key_claims"]}
+        for s in sources
+    ]
 
-    msg = truncate_to_tokens(prompt, MAX_INPUT_TOKENS)
+    head = _PROMPT_HEAD.format(topic_name=topic["name"], topic_angle=topic["angle"])
+    payload = orjson.dumps(compiled).decode("utf-8")
 
-    resp = client.chat.completions.create(
+    # Only the sources payload varies in size; the head's token count is cached
+    budget = max(0, MAX_INPUT_TOKENS - _head_token_count(head))
+    msg = head + truncate_to_tokens(payload, budget, MODEL)
+
+    resp = await client.chat.completions.create(
         model=MODEL,
         temperature=0.3,
         max_tokens=MAX_OUTPUT_TOKENS,
+        # JSON mode: the reply is a bare object, so extract_json's fallbacks stay cold
+        response_format={"type": "json_object"},
         messages=[
             {"role": "system", "content": "You output strict JSON only."},
             {"role": "user", "content": msg},
@@ -234,53 +266,56 @@ def format_sources(sources: List[Dict[str, str]]) -> str:
     return "\n".join(lines).strip()
 
 
-def main() -> None:
+def _append_sections(page_id: str, sections: List[Tuple[str, str]]) -> None:
+    # Sequential on purpose: blocks must land on the page in this order
+    for heading, body in sections:
+        append_section(page_id, heading, body)
+
+
+async def _amain() -> None:
     now = datetime.now(timezone.utc)
     week_of = monday_week_of_iso(now)
+    lookback = (now - timedelta(days=LOOKBACK_DAYS)).date().isoformat()
+
+    # Duplicate check and candidate pull are independent Notion reads: overlap them
+    existing, candidates = await asyncio.gather(
+        asyncio.to_thread(find_content_queue_page_for_week, week_of),
+        asyncio.to_thread(query_top_draft_sources, lookback_iso=lookback, max_sources=max(20, MAX_SOURCES * 3)),
+    )
 
     # -------------------------
     # Duplicate prevention
     # -------------------------
-    existing = find_content_queue_page_for_week(week_of)
     if existing:
         print(f"[SKIP] Draft already exists for week_of={week_of}. page_id={existing}")
         return
 
     # Topic rotation
-    topic = pick_topic_for_week(week_of)
+    topic = pick_topic_for_week(now.date())
     print(f"[INFO] Weekly topic: {topic['name']} (week_of={week_of})")
 
-    # Pull candidates from Research Library
-    lookback = (now - timedelta(days=LOOKBACK_DAYS)).date().isoformat()
-    candidates = query_top_draft_sources(lookback_iso=lookback, max_sources=max(20, MAX_SOURCES * 3))
-
     if not candidates:
         print(f"[SKIP] No draft-ready sources found (Use in Draft = True) in last {LOOKBACK_DAYS} days.")
         return
 
     # Light topical re-ranking: bias selection toward current topic while respecting usefulness score
-    scored: List[Tuple[float, Dict[str, Any]]] = []
-    for c in candidates:
-        t = get_prop_text(c, "Title")
-        s = get_prop_text(c, "Summary")
-        k = get_prop_text(c, "Key Claims")
-        affinity = score_source_for_topic(t, s, k, topic["keywords"])
-
-        # Pull usefulness score from Notion property (number)
-        try:
-            us = c["properties"]["Usefulness Score"]["number"] or 0.0
-        except Exception:
-            us = 0.0
-
-        # Combined score: keep usefulness dominant, but topic affinity gives a nudge
-        combined = (us * 1.0) + (affinity * 5.0)
-        scored.append((combined, c))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    selected = [c for _, c in scored[:MAX_SOURCES]]
+    fields = [source_fields(c) for c in candidates]
+    affinities = score_sources_for_topic(
+        [f["title"] for f in fields],
+        [f["summary"] for f in fields],
+        [f["key_claims"] for f in fields],
+        topic["keywords_lower"],
+    )
+
+    # Combined score: keep usefulness dominant, but topic affinity gives a nudge
+    scores = [(f["usefulness"] * 1.0) + (affinity * 5.0) for f, affinity in zip(fields, affinities)]
+
+    # Top-K only; nlargest keeps sorted(..., reverse=True)[:K] tie order
+    top = heapq.nlargest(MAX_SOURCES, range(len(fields)), key=scores.__getitem__)
+    selected = [fields[i] for i in top]
 
     # LLM build
-    pkg = llm_build_weekly_package(topic, selected)
+    pkg = await llm_build_weekly_package(topic, selected)
 
     article_title = pkg["article_title"].strip()
     thesis_angle = pkg["thesis_angle"].strip()
@@ -297,24 +332,37 @@ def main() -> None:
         status="Draft",
     )
 
-    set_content_queue_properties(
-    page_id=page_id,
-    thesis_angle=thesis_angle,
-    long_form_draft=long_form,
-    companion_posts=companion_posts,
-    comment_prompts=comment_prompts,
-    sources=sources_text,
-)
-
-    append_section(page_id, "Weekly Topic", topic["name"])
-    append_section(page_id, "Thesis Angle", thesis_angle)
-    append_section(page_id, "Long-form Article", long_form)
-    append_section(page_id, "Companion Posts", companion_posts)
-    append_section(page_id, "Comment Prompts", comment_prompts)
-    append_section(page_id, "Sources", sources_text)
+    # Property snippets and the block appends touch different parts of the page
+    await asyncio.gather(
+        asyncio.to_thread(
+            set_content_queue_properties,
+            page_id=page_id,
+            thesis_angle=thesis_angle,
+            long_form_draft=long_form,
+            companion_posts=companion_posts,
+            comment_prompts=comment_prompts,
+            sources=sources_text,
+        ),
+        asyncio.to_thread(
+            _append_sections,
+            page_id,
+            [
+                ("Weekly Topic", topic["name"]),
+                ("Thesis Angle", thesis_angle),
+                ("Long-form Article", long_form),
+                ("Companion Posts", companion_posts),
+                ("Comment Prompts", comment_prompts),
+                ("Sources", sources_text),
+            ],
+        ),
+    )
 
     print(f"[OK] Created Content Queue draft for week_of={week_of}: {article_title}")
 
 
+def main() -> None:
+    asyncio.run(_amain())
+
+
 if __name__ == "__main__":
     main()
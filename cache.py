@@ -0,0 +1,92 @@
+"""
+cache.py
+
+Exact-match LLM response cache backed by SQLite.
+
+Keys are SHA-256 hashes of everything that determines a response (model, prompt
+version, prompt text); values are the parsed JSON object the model returned.
+A rerun over rows a failed run left unprocessed reuses earlier responses instead
+of paying for the same completion again.
+
+The same database tracks OpenAI Batch API jobs submitted by summarize_articles
+until their results are applied.
+"""
+
+import hashlib
+import json
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from config import LLM_CACHE_DB_PATH
+
+_conn: Optional[sqlite3.Connection] = None
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(LLM_CACHE_DB_PATH)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                hash TEXT PRIMARY KEY,
+                json TEXT NOT NULL,
+                created_utc TEXT NOT NULL
+            )"""
+        )
+        _conn.execute(
+            """CREATE TABLE IF NOT EXISTS batch_jobs (
+                batch_id TEXT PRIMARY KEY,
+                pages_json TEXT NOT NULL,
+                created_utc TEXT NOT NULL
+            )"""
+        )
+        _conn.commit()
+    return _conn
+
+
+def make_key(*parts: str) -> str:
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    row = _get_conn().execute("SELECT json FROM llm_cache WHERE hash = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def set(key: str, value: Dict[str, Any]) -> None:
+    conn = _get_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache(hash, json, created_utc) VALUES (?, ?, ?)",
+            (key, json.dumps(value), datetime.now(timezone.utc).isoformat()),
+        )
+
+
+# -----------------------
+# Pending Batch API jobs
+# -----------------------
+def save_batch(batch_id: str, pages: List[Dict[str, Any]]) -> None:
+    """
+    Remember what a submitted batch needs to be applied later (one dict per request).
+    """
+    conn = _get_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO batch_jobs(batch_id, pages_json, created_utc) VALUES (?, ?, ?)",
+            (batch_id, json.dumps(pages), datetime.now(timezone.utc).isoformat()),
+        )
+
+
+def pending_batches() -> Dict[str, List[Dict[str, Any]]]:
+    conn = _get_conn()
+    rows = conn.execute("SELECT batch_id, pages_json FROM batch_jobs ORDER BY created_utc")
+    return {batch_id: json.loads(pages_json) for batch_id, pages_json in rows}
+
+
+def forget_batch(batch_id: str) -> None:
+    conn = _get_conn()
+    with conn:
+        conn.execute("DELETE FROM batch_jobs WHERE batch_id = ?", (batch_id,))
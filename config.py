@@ -66,8 +66,18 @@ KEYWORDS = [
     "value stream",
 ]
 
+# Lowercased once at import; tuples are reused as-is by the keyword matcher cache
+KEYWORDS_LOWER = tuple(k.lower() for k in KEYWORDS)
+
 # Dedupe DB path
 DEDUPE_DB_PATH = "rss_seen.db"
 
+# LLM response cache DB path (see cache.py)
+LLM_CACHE_DB_PATH = "llm_cache.db"
+
 # Safety: cap how long title+summary matching strings can be (RSS can be noisy)
 MAX_MATCH_TEXT_CHARS = 4000
+
+# The RSS keyword filter only scans the head of a feed summary (topical terms sit
+# up front); relevance scoring still reads the whole article excerpt
+MAX_KW_SCAN_CHARS = 1024
@@ -1,53 +1,97 @@
 import re
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selectolax.lexbor import LexborHTMLParser
 from typing import List, Tuple, Optional
 from config import MAX_MATCH_TEXT_CHARS
+from utils import has_keyword
 
 USER_AGENT = "Mozilla/5.0 (compatible; AIModernizationEngine/1.0; +https://example.com/bot)"
 
+# Hard cap on downloaded page size (bytes)
+MAX_HTML_BYTES = 2_000_000
+
+# One pooled session for all page fetches: keep-alive per host plus retries on transient errors
+_SESSION = requests.Session()
+_SESSION.headers.update({"User-Agent": USER_AGENT})
+_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    # raise_on_status=False: the last response still goes through raise_for_status()
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,
+    ),
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+# Runs of spaces/tabs collapse to one space; 3+ newlines collapse to a blank line
+_WS_RE = re.compile(r"[ \t]+|\n{3,}")
+
+def _ws_repl(m: "re.Match[str]") -> str:
+    return "\n\n" if m.group(0)[0] == "\n" else " "
+
 def _clean_whitespace(text: str) -> str:
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
+    return _WS_RE.sub(_ws_repl, text).strip()
 
-def fetch_html(url: str, timeout: int = 20) -> str:
-    resp = requests.get(url, timeout=timeout, headers={"User-Agent": USER_AGENT})
-    resp.raise_for_status()
-    return resp.text
+def fetch_html(url: str, timeout: int = 20, max_bytes: int = MAX_HTML_BYTES) -> str:
+    # Stream and stop at max_bytes: the excerpt only ever uses the first few KB of text
+    with _SESSION.get(url, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        chunks = []
+        total = 0
+        for chunk in resp.iter_content(chunk_size=65536):
+            chunks.append(chunk)
+            total += len(chunk)
+            if total >= max_bytes:
+                break
+        return b"".join(chunks)[:max_bytes].decode(resp.encoding or "utf-8", errors="replace")
 
 def extract_text_blocks(html: str) -> Tuple[str, List[str], List[str]]:
     """
     Returns: (title, headings, paragraphs)
     """
-    soup = BeautifulSoup(html, "lxml")
+    if not html or not html.strip():
+        return "", [], []
+
+    tree = LexborHTMLParser(html)
 
     # remove junk
-    for tag in soup(["script", "style", "noscript", "svg", "header", "footer", "nav", "aside"]):
+    for tag in tree.css("script, style, noscript, svg, header, footer, nav, aside"):
         tag.decompose()
 
     title = ""
-    if soup.title and soup.title.string:
-        title = soup.title.string.strip()
+    title_el = tree.css_first("title")
+    if title_el is not None:
+        title = title_el.text(strip=True)
 
     # Prefer <article>, fallback to body
-    root = soup.find("article") or soup.body or soup
+    root = tree.css_first("article") or tree.body or tree.root
+    if root is None:
+        return title, [], []
 
     headings = []
-    for h in root.find_all(["h1", "h2", "h3"]):
-        t = h.get_text(" ", strip=True)
+    for h in root.css("h1, h2, h3"):
+        t = h.text(separator=" ", strip=True)
         if t and len(t) <= 180:
             headings.append(t)
 
     paragraphs = []
-    for p in root.find_all("p"):
-        t = p.get_text(" ", strip=True)
+    for p in root.css("p"):
+        t = p.text(separator=" ", strip=True)
         # Drop very short / boilerplate-ish fragments
         if t and len(t) >= 60:
             paragraphs.append(t)
 
     return title, headings, paragraphs
 
+def fetch_and_extract(url: str) -> Tuple[str, List[str], List[str]]:
+    return extract_text_blocks(fetch_html(url))
+
 def build_excerpt(
     title: str,
     headings: List[str],
@@ -63,29 +107,29 @@ def build_excerpt(
     - paragraphs that match keywords
     and cap total characters.
     """
-    kw_lower = [k.lower() for k in keywords]
-    selected = []
-
-    # First N paragraphs
-    first_n = paragraphs[:4]
-    selected.extend(first_n)
-
-    # Keyword-matching paragraphs
-    for p in paragraphs[4:]:
-        pl = p.lower()
-        if any(k in pl for k in kw_lower):
-            selected.append(p)
-        if len(selected) >= 10:  # cap count
-            break
+    cap = min(max_chars, MAX_MATCH_TEXT_CHARS)
 
     excerpt_parts = []
     if title:
-        excerpt_parts.append(f"TITLE: {title}")
+        excerpt_parts.append(_clean_whitespace(f"TITLE: {title}"))
     if headings:
-        excerpt_parts.append("HEADINGS:\n- " + "\n- ".join(headings[:8]))
+        excerpt_parts.append(_clean_whitespace("HEADINGS:\n- " + "\n- ".join(headings[:8])))
+
+    # Running length of the excerpt so far: stop collecting paragraphs (and
+    # stop keyword-scanning them) once the cap is reached.
+    size = len("\n\n".join(excerpt_parts + ["CONTENT:\n"]))
+    selected = []
+    for i, p in enumerate(paragraphs):
+        if size >= cap or len(selected) >= 10:  # cap chars / count
+            break
+        # First N paragraphs, then keyword-matching ones
+        if i >= 4 and not has_keyword(p, keywords):
+            continue
+        p = _clean_whitespace(p)
+        size += len(p) + (2 if selected else 0)
+        selected.append(p)
+
     if selected:
         excerpt_parts.append("CONTENT:\n" + "\n\n".join(selected))
 
-    excerpt = _clean_whitespace("\n\n".join(excerpt_parts))
-    excerpt = excerpt[:min(max_chars, MAX_MATCH_TEXT_CHARS)]
-    return excerpt
+    return "\n\n".join(excerpt_parts)[:cap]
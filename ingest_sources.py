@@ -1,12 +1,108 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
 import feedparser
+import httpx
 from rss_sources import RSS_FEEDS
-from config import RECENCY_DAYS, ENABLE_KEYWORD_FILTER, KEYWORDS, DEDUPE_DB_PATH, MAX_MATCH_TEXT_CHARS
-from notion_api import create_research_entry
-from utils import init_dedupe_db, already_seen, mark_seen, parse_published, is_within_days, safe_text
+from config import (
+    RECENCY_DAYS,
+    ENABLE_KEYWORD_FILTER,
+    KEYWORDS_LOWER,
+    DEDUPE_DB_PATH,
+    MAX_MATCH_TEXT_CHARS,
+    MAX_KW_SCAN_CHARS,
+)
+from notion_api import create_research_entries_async
+from utils import (
+    init_dedupe_db,
+    seen_urls_in,
+    mark_seen_many,
+    get_feed_meta,
+    set_feed_meta_many,
+    published_tuple,
+    recency_cutoff,
+    safe_text,
+    has_keyword,
+)
+
+log = logging.getLogger(__name__)
+
+FEED_FETCH_TIMEOUT = 15
+
+_MIN_KW_LEN = min(len(k) for k in KEYWORDS_LOWER)
+
+async def _fetch_feed(
+    client: httpx.AsyncClient,
+    feed_url: str,
+    etag: Optional[str] = None,
+    modified: Optional[str] = None,
+) -> feedparser.FeedParserDict:
+    # Conditional GET: an unchanged feed answers 304 with no body to download or parse
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+    try:
+        resp = await client.get(feed_url, headers=headers)
+        if resp.status_code == 304:
+            return feedparser.FeedParserDict(feed=feedparser.FeedParserDict(), entries=[], status=304)
+        resp.raise_for_status()
+    except Exception as e:
+        log.warning("Feed fetch failed for %s: %s", feed_url, e)
+        # Same shape feedparser returns for an unreachable feed: no entries
+        return feedparser.FeedParserDict(feed=feedparser.FeedParserDict(), entries=[], bozo=True, bozo_exception=e)
+
+    # XML parsing is CPU work: keep it off the event loop. Summaries are only
+    # keyword-matched (never stored or rendered), so skip feedparser's HTML
+    # sanitizing and relative-URI rewriting passes.
+    response_headers = {"content-type": resp.headers.get("content-type", ""), "content-location": str(resp.url)}
+    loop = asyncio.get_running_loop()
+    parsed = await loop.run_in_executor(
+        None,
+        lambda: feedparser.parse(
+            resp.content,
+            response_headers=response_headers,
+            resolve_relative_uris=False,
+            sanitize_html=False,
+        ),
+    )
+    parsed["status"] = resp.status_code
+    parsed["etag"] = resp.headers.get("etag")
+    parsed["modified"] = resp.headers.get("last-modified")
+    return parsed
+
+async def fetch_feeds(
+    feed_urls: List[str],
+    meta: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None,
+) -> List[feedparser.FeedParserDict]:
+    """
+    Fetch all feeds concurrently and parse each body with feedparser. Results are in input order.
+    `meta` maps feed url -> (etag, last-modified) for conditional requests; unchanged feeds
+    come back with status 304 and no entries.
+    """
+    meta = meta or {}
+    async with httpx.AsyncClient(
+        timeout=FEED_FETCH_TIMEOUT,
+        follow_redirects=True,
+        headers={"User-Agent": feedparser.USER_AGENT},
+    ) as client:
+        return await asyncio.gather(*(_fetch_feed(client, u, *meta.get(u, (None, None))) for u in feed_urls))
 
 def matches_keywords(title: str, summary: str) -> bool:
-    haystack = (title + "\n" + summary).lower()
-    return any(kw.lower() in haystack for kw in KEYWORDS)
+    title = title[:256]
+    summary = summary[:MAX_KW_SCAN_CHARS]
+    if len(title) < _MIN_KW_LEN and len(summary) < _MIN_KW_LEN:
+        return False
+    # Title first: it is short and usually carries the topic, so a hit there skips
+    # lowercasing/scanning the summary. No keyword spans the newline that used to
+    # join them, so this matches the same entries.
+    # Substring match, as the filter always did: "transformations" hits "transformation"
+    return has_keyword(title, KEYWORDS_LOWER, whole_words=False) or has_keyword(
+        summary, KEYWORDS_LOWER, whole_words=False
+    )
 
 def ingest():
     conn = init_dedupe_db(DEDUPE_DB_PATH)
@@ -15,10 +111,31 @@ def ingest():
     skipped_seen = 0
     skipped_old = 0
     skipped_kw = 0
-    errors = 0
+    unchanged_feeds = 0
+
+    # Notion creates are queued and flushed concurrently after the feed pass;
+    # seen-marks are written in one transaction at the end.
+    pending = []
+    pending_feeds = []  # feed url of each pending entry
+    to_mark = []
+
+    # Fetch + parse feeds concurrently (network-bound); dedupe and Notion writes
+    # below stay on this thread with the single sqlite connection.
+    feeds = asyncio.run(fetch_feeds(RSS_FEEDS, get_feed_meta(conn)))
+
+    # One dedupe query for the whole run; URLs queued/marked below are added
+    # so a link repeated across feeds is handled once.
+    seen = seen_urls_in(conn, [e.get("link") for f in feeds for e in f.entries if e.get("link")])
+
+    # Recency cutoff computed once per run, as a (Y, m, d, H, M, S) tuple so old
+    # entries are rejected by a plain tuple compare without building datetimes.
+    cutoff = recency_cutoff(RECENCY_DAYS).timetuple()[:6]
+
+    for feed_url, feed in zip(RSS_FEEDS, feeds):
+        if feed.get("status") == 304:
+            unchanged_feeds += 1
+            continue
 
-    for feed_url in RSS_FEEDS:
-        feed = feedparser.parse(feed_url)
         feed_title = (feed.feed.get("title") or "Unknown").strip()
 
         for entry in feed.entries:
@@ -26,12 +143,12 @@ def ingest():
             if not url:
                 continue
 
-            if already_seen(conn, url):
+            if url in seen:
                 skipped_seen += 1
                 continue
 
-            published_dt = parse_published(entry)
-            if not is_within_days(published_dt, RECENCY_DAYS):
+            published = published_tuple(entry)
+            if published is None or published < cutoff:
                 skipped_old += 1
                 continue
 
@@ -41,25 +158,61 @@ def ingest():
             if ENABLE_KEYWORD_FILTER and not matches_keywords(title, summary):
                 skipped_kw += 1
                 # mark seen to avoid reprocessing noise each run
-                mark_seen(conn, url)
+                to_mark.append(url)
+                seen.add(url)
                 continue
 
-            try:
-                create_research_entry(
-                    title=title if title else url,
-                    url=url,
-                    source=feed_title,
-                    published_date_iso=published_dt.isoformat() if published_dt else None,
-                )
-                ingested += 1
-            except Exception as e:
-                errors += 1
-                print(f"[ERROR] Notion create failed for {url}: {e}")
-                continue
+            pending.append(
+                {
+                    "title": title if title else url,
+                    "url": url,
+                    "source": feed_title,
+                    "published_date_iso": datetime(*published, tzinfo=timezone.utc).isoformat(),
+                }
+            )
+            pending_feeds.append(feed_url)
+            seen.add(url)
+
+    results = asyncio.run(create_research_entries_async(pending)) if pending else []
+    failures: List[Tuple[str, Exception]] = []
+    failed_feeds = set()
+    for entry, feed_url, err in zip(pending, pending_feeds, results):
+        url = entry["url"]
+        if err is not None:
+            failures.append((url, err))
+            failed_feeds.add(feed_url)
+            continue
+        ingested += 1
+        to_mark.append(url)
+
+    mark_seen_many(conn, to_mark)
+
+    # Remember validators only for feeds fully processed this run, so a feed with a
+    # failed Notion create is fetched in full (not 304'd) and retried next time.
+    set_feed_meta_many(
+        conn,
+        [
+            (feed_url, feed.get("etag"), feed.get("modified"))
+            for feed_url, feed in zip(RSS_FEEDS, feeds)
+            if feed.get("status") == 200 and feed_url not in failed_feeds and (feed.get("etag") or feed.get("modified"))
+        ],
+    )
 
-            mark_seen(conn, url)
+    # One summary record for all failed creates instead of a line per entry
+    if failures:
+        log.error(
+            "Notion create failed for %d entries:\n%s",
+            len(failures),
+            "\n".join(f"  {url}: {err}" for url, err in failures),
+        )
 
-    print(f"Ingest complete. ingested={ingested} skipped_seen={skipped_seen} skipped_old={skipped_old} skipped_kw={skipped_kw} errors={errors}")
+    log.info(
+        "Ingest complete. ingested=%d skipped_seen=%d skipped_old=%d skipped_kw=%d unchanged_feeds=%d errors=%d",
+        ingested, skipped_seen, skipped_old, skipped_kw, unchanged_feeds, len(failures),
+    )
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    # basicConfig(INFO) would otherwise log every httpx request line
+    logging.getLogger("httpx").setLevel(logging.WARNING)
     ingest()
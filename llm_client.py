@@ -0,0 +1,21 @@
+"""
+llm_client.py
+
+Shared AsyncOpenAI client for summarize_articles and build_weekly_draft:
+one HTTP connection pool (keep-alive to api.openai.com) and one retry policy.
+
+Env vars required:
+- OPENAI_API_KEY
+"""
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# Enough keep-alive connections for the summarizer's LLM fan-out (LLM_CONCURRENCY);
+# timeouts stay at the SDK defaults, long weekly generations need them.
+_HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+
+client = AsyncOpenAI(
+    http_client=DefaultAsyncHttpxClient(limits=_HTTP_LIMITS),
+    max_retries=2,
+)
@@ -23,10 +23,36 @@ Optional (required for weekly draft builder):
 """
 
 import os
-from typing import Optional, List, Dict, Any
+import asyncio
+import json
+import threading
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
 from datetime import datetime, timezone, timedelta
 
-from notion_client import Client
+import httpx
+from notion_client import AsyncClient, Client
+
+__all__ = [
+    "get_client",
+    "clear_query_cache",
+    "create_research_entry",
+    "create_research_entries_async",
+    "query_unprocessed_research",
+    "iter_unprocessed_research",
+    "update_research_page",
+    "update_research_pages_async",
+    "get_prop_text",
+    "prop_text",
+    "get_prop_url",
+    "prop_url",
+    "get_prop_select",
+    "query_top_draft_sources",
+    "find_content_queue_page_for_week",
+    "create_content_queue_page",
+    "set_content_queue_properties",
+    "append_section",
+]
 
 
 # -----------------------
@@ -39,11 +65,98 @@ def _get_env(name: str) -> str:
     return val
 
 
-NOTION_TOKEN = _get_env("NOTION_TOKEN")
-NOTION_RESEARCH_DB_ID = _get_env("NOTION_RESEARCH_DB_ID")
-NOTION_QUEUE_DB_ID = os.environ.get("NOTION_QUEUE_DB_ID", "")
+def _research_db_id() -> str:
+    return _get_env("NOTION_RESEARCH_DB_ID")
 
-notion = Client(auth=NOTION_TOKEN)
+
+def _queue_db_id() -> str:
+    val = os.environ.get("NOTION_QUEUE_DB_ID", "")
+    if not val:
+        raise RuntimeError("Missing NOTION_QUEUE_DB_ID env var / secret.")
+    return val
+
+
+_notion: Optional[Client] = None
+_notion_lock = threading.Lock()
+
+# One keep-alive pool per client: every Notion call reuses the open TLS connections
+# instead of handshaking again. Sized above the async create concurrency.
+_HTTP_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=10)
+
+
+def get_client() -> Client:
+    """
+    Shared Notion client, created on first use so importing this module needs no env vars.
+    """
+    global _notion
+    if _notion is None:
+        # Callers fan out via asyncio.to_thread; without the lock two threads
+        # can each build a client (and leak one connection pool)
+        with _notion_lock:
+            if _notion is None:
+                _notion = Client(auth=_get_env("NOTION_TOKEN"), client=httpx.Client(limits=_HTTP_LIMITS))
+    return _notion
+
+
+# -----------------------
+# Database query (paged + memoized per run)
+# -----------------------
+_QUERY_CACHE: Dict[tuple, List[Dict[str, Any]]] = {}
+
+
+def clear_query_cache() -> None:
+    """
+    Drop memoized query results. Writes through this module call it automatically.
+    """
+    _QUERY_CACHE.clear()
+
+
+def _query_database(
+    database_id: str,
+    filter: Dict[str, Any],
+    limit: int,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Up to `limit` rows, following start_cursor past Notion's 100-row page cap.
+    Identical queries within a run are served from memory.
+    """
+    key = (database_id, json.dumps(filter, sort_keys=True), json.dumps(sorts, sort_keys=True), limit)
+    if key in _QUERY_CACHE:
+        return list(_QUERY_CACHE[key])
+
+    results = list(islice(_iter_database(database_id, filter, min(100, limit), sorts), limit))
+
+    _QUERY_CACHE[key] = results
+    return list(results)
+
+
+def _iter_database(
+    database_id: str,
+    filter: Dict[str, Any],
+    page_size: int = 100,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream matching rows, one query per `page_size` rows (max 100), following
+    start_cursor until has_more is False. Stop iterating to stop fetching.
+    """
+    cursor: Optional[str] = None
+    while True:
+        kwargs: Dict[str, Any] = {
+            "database_id": database_id,
+            "filter": filter,
+            "page_size": min(100, page_size),
+        }
+        if sorts:
+            kwargs["sorts"] = sorts
+        if cursor:
+            kwargs["start_cursor"] = cursor
+        resp = get_client().databases.query(**kwargs)
+        yield from resp.get("results", [])
+        if not resp.get("has_more"):
+            return
+        cursor = resp.get("next_cursor")
 
 
 # -----------------------
@@ -58,6 +171,19 @@ def create_research_entry(
     """
     Create a new research row with minimal fields.
     """
+    get_client().pages.create(
+        parent={"database_id": _research_db_id()},
+        properties=_research_entry_properties(title, url, source, published_date_iso),
+    )
+    clear_query_cache()
+
+
+def _research_entry_properties(
+    title: str,
+    url: str,
+    source: str,
+    published_date_iso: Optional[str] = None,
+) -> Dict[str, Any]:
     properties: Dict[str, Any] = {
         "Title": {"title": [{"text": {"content": title}}]},
         "URL": {"url": url},
@@ -67,23 +193,78 @@ def create_research_entry(
     }
     if published_date_iso:
         properties["Published Date"] = {"date": {"start": published_date_iso}}
+    return properties
 
-    notion.pages.create(
-        parent={"database_id": NOTION_RESEARCH_DB_ID},
-        properties=properties,
-    )
+
+async def _run_limited(
+    op: Callable[[AsyncClient, Dict[str, Any]], Awaitable[Any]],
+    items: List[Dict[str, Any]],
+    concurrency: int,
+) -> List[Optional[Exception]]:
+    """
+    await op(client, item) for every item on one pooled async Notion client, at most
+    `concurrency` in flight (Notion allows ~3 req/s). Returns one item per input,
+    in order: None on success, else the exception.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    # Own the pool here: entering notion's AsyncClient as a context manager would
+    # replace the passed-in httpx client with a fresh default one.
+    async with httpx.AsyncClient(limits=_HTTP_LIMITS) as http:
+        client = AsyncClient(auth=_get_env("NOTION_TOKEN"), client=http)
+
+        async def _one(item: Dict[str, Any]) -> Optional[Exception]:
+            async with sem:
+                try:
+                    await op(client, item)
+                except Exception as e:
+                    return e
+            return None
+
+        results = await asyncio.gather(*(_one(i) for i in items))
+    clear_query_cache()
+    return results
+
+
+async def create_research_entries_async(
+    entries: List[Dict[str, Any]],
+    concurrency: int = 3,
+) -> List[Optional[Exception]]:
+    """
+    Create many research rows concurrently (Notion has no bulk create).
+    `entries` are create_research_entry kwargs.
+    Returns one item per entry, in order: None on success, else the exception.
+    """
+    async def _create(client: AsyncClient, entry: Dict[str, Any]) -> None:
+        await client.pages.create(
+            parent={"database_id": _research_db_id()},
+            properties=_research_entry_properties(**entry),
+        )
+
+    return await _run_limited(_create, entries, concurrency)
 
 
 def query_unprocessed_research(limit: int = 20) -> List[Dict[str, Any]]:
     """
     Pull rows where Processed == False.
     """
-    resp = notion.databases.query(
-        database_id=NOTION_RESEARCH_DB_ID,
+    return _query_database(
+        _research_db_id(),
         filter={"property": "Processed", "checkbox": {"equals": False}},
-        page_size=limit,
+        limit=limit,
+    )
+
+
+def iter_unprocessed_research(page_size: int = 100) -> Iterator[Dict[str, Any]]:
+    """
+    Stream every row where Processed == False (not memoized); callers stop
+    iterating once they have enough.
+    """
+    return _iter_database(
+        _research_db_id(),
+        filter={"property": "Processed", "checkbox": {"equals": False}},
+        page_size=page_size,
     )
-    return resp.get("results", [])
 
 
 def update_research_page(
@@ -99,9 +280,23 @@ def update_research_page(
     Update the research row with generated fields.
     Property names MUST match your Research Library database.
     """
-    tag_objs = [{"name": t[:50]} for t in tags if t]
+    get_client().pages.update(
+        page_id=page_id,
+        properties=_research_update_properties(summary, key_claims, tags, usefulness_score, use_in_draft, processed),
+    )
+    clear_query_cache()
+
 
-    props: Dict[str, Any] = {
+def _research_update_properties(
+    summary: str,
+    key_claims: str,
+    tags: List[str],
+    usefulness_score: float,
+    use_in_draft: bool,
+    processed: bool = True,
+) -> Dict[str, Any]:
+    tag_objs = [{"name": t[:50]} for t in tags if t]
+    return {
         "Summary": {"rich_text": [{"text": {"content": (summary or "")[:2000]}}]},
         "Key Claims": {"rich_text": [{"text": {"content": (key_claims or "")[:2000]}}]},
         "Tags": {"multi_select": tag_objs},
@@ -110,7 +305,22 @@ def update_research_page(
         "Processed": {"checkbox": bool(processed)},
     }
 
-    notion.pages.update(page_id=page_id, properties=props)
+
+async def update_research_pages_async(
+    updates: List[Dict[str, Any]],
+    concurrency: int = 3,
+) -> List[Optional[Exception]]:
+    """
+    Apply many research row updates concurrently.
+    `updates` are update_research_page kwargs.
+    Returns one item per update, in order: None on success, else the exception.
+    """
+    async def _update(client: AsyncClient, update: Dict[str, Any]) -> None:
+        fields = dict(update)
+        page_id = fields.pop("page_id")
+        await client.pages.update(page_id=page_id, properties=_research_update_properties(**fields))
+
+    return await _run_limited(_update, updates, concurrency)
 
 
 # -----------------------
@@ -118,8 +328,13 @@ def update_research_page(
 # -----------------------
 def get_prop_text(page: Dict[str, Any], prop_name: str) -> str:
     props = page.get("properties", {})
-    p = props.get(prop_name, {})
+    return prop_text(props.get(prop_name, {}))
+
 
+def prop_text(p: Dict[str, Any]) -> str:
+    """
+    Plain text of an already-looked-up title / rich_text property value.
+    """
     if p.get("type") == "title":
         parts = p.get("title", [])
         return "".join([x.get("plain_text", "") for x in parts]).strip()
@@ -132,7 +347,10 @@ def get_prop_text(page: Dict[str, Any], prop_name: str) -> str:
 
 
 def get_prop_url(page: Dict[str, Any], prop_name: str) -> str:
-    p = page.get("properties", {}).get(prop_name, {})
+    return prop_url(page.get("properties", {}).get(prop_name, {}))
+
+
+def prop_url(p: Dict[str, Any]) -> str:
     if p.get("type") == "url":
         return p.get("url") or ""
     return ""
@@ -156,8 +374,8 @@ def query_top_draft_sources(lookback_iso: str, max_sources: int = 8) -> List[Dic
     - Published Date >= lookback_iso
     Sorted by Usefulness Score desc
     """
-    resp = notion.databases.query(
-        database_id=NOTION_RESEARCH_DB_ID,
+    return _query_database(
+        _research_db_id(),
         filter={
             "and": [
                 {"property": "Processed", "checkbox": {"equals": True}},
@@ -166,9 +384,8 @@ def query_top_draft_sources(lookback_iso: str, max_sources: int = 8) -> List[Dic
             ]
         },
         sorts=[{"property": "Usefulness Score", "direction": "descending"}],
-        page_size=max_sources,
+        limit=max_sources,
     )
-    return resp.get("results", [])
 
 
 # -----------------------
@@ -179,11 +396,8 @@ def find_content_queue_page_for_week(week_of_iso: str) -> Optional[str]:
     Duplicate prevention:
     Returns page_id if a Content Queue entry already exists for the given Week Of date.
     """
-    if not NOTION_QUEUE_DB_ID:
-        raise RuntimeError("Missing NOTION_QUEUE_DB_ID env var / secret.")
-
-    resp = notion.databases.query(
-        database_id=NOTION_QUEUE_DB_ID,
+    resp = get_client().databases.query(
+        database_id=_queue_db_id(),
         filter={"property": "Week Of", "date": {"equals": week_of_iso}},
         page_size=1,
     )
@@ -196,11 +410,8 @@ def create_content_queue_page(title: str, week_of_iso: str, topic: str, status:
     Create a new Content Queue page and return its page_id.
     Keeps properties small; large bodies are appended as blocks.
     """
-    if not NOTION_QUEUE_DB_ID:
-        raise RuntimeError("Missing NOTION_QUEUE_DB_ID env var / secret.")
-
-    page = notion.pages.create(
-        parent={"database_id": NOTION_QUEUE_DB_ID},
+    page = get_client().pages.create(
+        parent={"database_id": _queue_db_id()},
         properties={
             "Title": {"title": [{"text": {"content": title}}]},
             "Week Of": {"date": {"start": week_of_iso}},
@@ -241,42 +452,64 @@ def set_content_queue_properties(
     if sources:
         props["Sources"] = {"rich_text": [{"text": {"content": sources[:2000]}}] }
 
-    notion.pages.update(page_id=page_id, properties=props)
+    get_client().pages.update(page_id=page_id, properties=props)
 
 # -----------------------
 # Block append utilities
 # -----------------------
 
-def _chunk_text(text: str, max_len: int = 1800) -> List[str]:
+MAX_BLOCKS_PER_APPEND = 100
+
+
+def _paragraph_block(content: str) -> Dict[str, Any]:
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [
+                {"type": "text", "text": {"content": content}}
+            ]
+        },
+    }
+
+
+def _paragraph_blocks(text: str, max_len: int = 1800) -> Iterator[Dict[str, Any]]:
+    """
+    Paragraph blocks for `text`, each chunk <= max_len chars, yielded as soon as a chunk is final.
+    """
     if not text:
-        return [""]
+        yield _paragraph_block("")
+        return
 
-    paras = [p.strip() for p in text.split("\n") if p.strip()]
-    chunks: List[str] = []
-    cur = ""
+    # Current chunk as a list of lines + its joined length (no repeated concat)
+    cur: List[str] = []
+    cur_len = 0
+
+    for line in text.split("\n"):
+        p = line.strip()
+        if not p:
+            continue
 
-    for p in paras:
         if len(p) > max_len:
             if cur:
-                chunks.append(cur)
-                cur = ""
-            start = 0
-            while start < len(p):
-                chunks.append(p[start:start + max_len])
-                start += max_len
+                yield _paragraph_block("\n".join(cur))
+                cur = []
+                cur_len = 0
+            for start in range(0, len(p), max_len):
+                yield _paragraph_block(p[start:start + max_len])
             continue
 
-        if len(cur) + len(p) + 1 <= max_len:
-            cur = (cur + "\n" + p).strip()
+        if cur_len + len(p) + 1 <= max_len:
+            cur_len += len(p) + (1 if cur else 0)
+            cur.append(p)
         else:
             if cur:
-                chunks.append(cur)
-            cur = p
+                yield _paragraph_block("\n".join(cur))
+            cur = [p]
+            cur_len = len(p)
 
     if cur:
-        chunks.append(cur)
-
-    return chunks
+        yield _paragraph_block("\n".join(cur))
 
 
 def append_section(page_id: str, heading: str, body: str) -> None:
@@ -291,23 +524,14 @@ def append_section(page_id: str, heading: str, body: str) -> None:
             },
         }
     ]
-
-    for chunk in _chunk_text(body):
-        children.append(
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {"type": "text", "text": {"content": chunk}}
-                    ]
-                },
-            }
+    children.extend(_paragraph_blocks(body))
+
+    # Notion accepts at most 100 children per append. Batches go out in order,
+    # one after another: concurrent appends could interleave on the page.
+    for i in range(0, len(children), MAX_BLOCKS_PER_APPEND):
+        get_client().blocks.children.append(
+            block_id=page_id,
+            children=children[i:i + MAX_BLOCKS_PER_APPEND],
         )
 
-    notion.blocks.children.append(
-        block_id=page_id,
-        children=children,
-    )
-
     print(f"[NOTION] Appended section '{heading}' with {len(children)} blocks")
@@ -1,6 +1,11 @@
 from datetime import datetime, timezone
 from typing import List, Tuple
 from config import KEYWORDS
+from utils import find_keywords_many
+
+# Hoisted once: the matcher cache is keyed on this exact tuple, and matched
+# keywords come back in their original casing (used as fallback tags).
+_KEYWORDS = tuple(KEYWORDS)
 
 # Optional: source quality weighting (tune as you like)
 SOURCE_WEIGHTS = {
@@ -16,41 +21,56 @@ SOURCE_WEIGHTS = {
     "Microsoft": 1.0,
 }
 
-def score_relevance(title: str, excerpt: str, source: str, published_iso: str | None) -> Tuple[float, List[str]]:
-    """
-    Returns (score_0_100, matched_keywords)
-    No LLM call: cheap + deterministic.
-    """
-    text = (title + "\n" + excerpt).lower()
-
-    matched = []
-    for kw in KEYWORDS:
-        if kw.lower() in text:
-            matched.append(kw)
-
-    # Base score from keyword matches (diminishing returns)
-    kw_score = min(60.0, 8.0 * len(set(matched)))
+# Lowercased once; probed in SOURCE_WEIGHTS order so the first match wins as before
+_SOURCE_WEIGHTS_LC = tuple((k.lower(), w) for k, w in SOURCE_WEIGHTS.items())
 
+def _recency_score(published_iso: str | None, now: datetime) -> float:
     # Recency score (0–25)
-    recency_score = 0.0
-    if published_iso:
-        try:
-            pub = datetime.fromisoformat(published_iso.replace("Z", "+00:00"))
-            if pub.tzinfo is None:
-                pub = pub.replace(tzinfo=timezone.utc)
-            age_days = (datetime.now(timezone.utc) - pub).days
-            # 0 days => 25, 14 days => ~10, 30+ => 0
-            recency_score = max(0.0, 25.0 * (1.0 - min(age_days, 30) / 30.0))
-        except Exception:
-            recency_score = 8.0  # fallback
+    if not published_iso:
+        return 0.0
+    try:
+        pub = datetime.fromisoformat(published_iso.replace("Z", "+00:00"))
+        if pub.tzinfo is None:
+            pub = pub.replace(tzinfo=timezone.utc)
+        age_days = (now - pub).days
+        # 0 days => 25, 14 days => ~10, 30+ => 0
+        return max(0.0, 25.0 * (1.0 - min(age_days, 30) / 30.0))
+    except Exception:
+        return 8.0  # fallback
 
+def _source_multiplier(source: str) -> float:
     # Source multiplier (0.9–1.2 typical)
-    mult = 1.0
-    for k, w in SOURCE_WEIGHTS.items():
-        if k.lower() in (source or "").lower():
-            mult = w
-            break
+    src = (source or "").lower()
+    return next((w for k, w in _SOURCE_WEIGHTS_LC if k in src), 1.0)
 
+def _combine(matched: List[str], recency_score: float, mult: float) -> float:
+    # Base score from keyword matches (diminishing returns)
+    kw_score = min(60.0, 8.0 * len(set(matched)))
     raw = (kw_score + recency_score) * mult
-    score = max(0.0, min(100.0, raw))
-    return score, matched
+    return max(0.0, min(100.0, raw))
+
+def score_relevance(title: str, excerpt: str, source: str, published_iso: str | None) -> Tuple[float, List[str]]:
+    """
+    Returns (score_0_100, matched_keywords)
+    No LLM call: cheap + deterministic.
+    """
+    return score_relevance_batch([title], [excerpt], [source], [published_iso])[0]
+
+def score_relevance_batch(
+    titles: List[str],
+    excerpts: List[str],
+    sources: List[str],
+    published_isos: List[str | None],
+) -> List[Tuple[float, List[str]]]:
+    """
+    score_relevance for many articles: one keyword-automaton pass over all
+    texts and a single `now` for the recency math.
+    """
+    now = datetime.now(timezone.utc)
+    matched_all = find_keywords_many(
+        [t + "\n" + e for t, e in zip(titles, excerpts)], _KEYWORDS, whole_words=False
+    )
+    return [
+        (_combine(matched, _recency_score(pub, now), _source_multiplier(src)), matched)
+        for matched, src, pub in zip(matched_all, sources, published_isos)
+    ]
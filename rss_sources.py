@@ -1,6 +1,7 @@
 # Curated, high-signal RSS feeds (expanded + strategic balanced)
 
-RSS_FEEDS = [
+# Order-preserving dedupe: a URL listed under two sections is fetched once per run
+RSS_FEEDS = tuple(dict.fromkeys([
 
     # ----------------------------
     # Operating Model & Governance
@@ -40,4 +41,4 @@ RSS_FEEDS = [
     # ----------------------------
     "https://fs.blog/feed/",
     "https://martinfowler.com/feed.atom",
-]
+]))
@@ -4,8 +4,14 @@ summarize_articles.py
 - Queries Notion Research Library for rows where Processed == False
 - Fetches each URL and extracts a small excerpt (cost control)
 - Scores relevance locally (no extra LLM calls)
-- Calls OpenAI Chat Completions ONCE per article to produce JSON
+- Calls OpenAI Chat Completions ONCE per article to produce JSON (responses cached by prompt, see cache.py)
 - Updates Notion with Summary, Key Claims, Tags, Usefulness Score, Use in Draft, Processed
+- Articles are processed concurrently: HTML is prefetched on a thread pool while
+  LLM calls run, bounded by LLM_CONCURRENCY
+
+Batch mode (OpenAI Batch API, half-price tokens, results within 24h):
+- python summarize_articles.py --submit-batch   # prepare rows, submit one batch job
+- python summarize_articles.py --apply-batches  # write finished jobs back to Notion
 
 Env vars required:
 - NOTION_TOKEN
@@ -17,40 +23,44 @@ Optional:
 - MAX_INPUT_TOKENS (default: 2500)
 - MAX_OUTPUT_TOKENS (default: 350)
 - BATCH_LIMIT (default: 15)
+- LLM_CONCURRENCY (default: 8)
 """
 
 import os
+import argparse
+import asyncio
 import json
-import re
-from typing import List, Dict, Any, Optional
-
-from openai import OpenAI
-import tiktoken
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple
 
 from notion_api import (
-    query_unprocessed_research,
-    update_research_page,
+    iter_unprocessed_research,
+    update_research_pages_async,
     get_prop_text,
     get_prop_url,
     get_prop_select,
 )
-from extractor import fetch_html, extract_text_blocks, build_excerpt
-from relevance import score_relevance
-from config import KEYWORDS
+from extractor import fetch_and_extract, build_excerpt
+from relevance import score_relevance_batch
+from llm_client import client
+import cache
+from utils import get_encoder, truncate_to_tokens
+from config import KEYWORDS_LOWER
 
 MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 MAX_INPUT_TOKENS = int(os.environ.get("MAX_INPUT_TOKENS", "2500"))
 MAX_OUTPUT_TOKENS = int(os.environ.get("MAX_OUTPUT_TOKENS", "350"))
 BATCH_LIMIT = int(os.environ.get("BATCH_LIMIT", "15"))
 MIN_EXCERPT_CHARS = int(os.environ.get("MIN_EXCERPT_CHARS", "500"))
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "8"))
 
-client = OpenAI()
+# Threads prefetching article HTML ahead of the LLM calls
+FETCH_WORKERS = 4
 
-
-def truncate_to_tokens(text: str, limit: int) -> str:
-    enc = tiktoken.encoding_for_model(MODEL)
-    toks = enc.encode(text)
-    return enc.decode(toks[:limit])
+# Bump when the prompt or output schema changes so cached responses are not reused
+PROMPT_VERSION = "3"
 
 
 def get_published_iso(page: Dict[str, Any]) -> Optional[str]:
@@ -63,43 +73,33 @@ def get_published_iso(page: Dict[str, Any]) -> Optional[str]:
     return None
 
 
-def _extract_json(raw: str) -> Dict[str, Any]:
-    """
-    Robust JSON extraction:
-    - handles code fences
-    - handles leading/trailing text
-    - extracts first {...} object found
-    """
-    if not raw:
-        raise ValueError("Empty model response")
-
-    raw = raw.strip()
-
-    # Strip ```json ... ``` fences
-    if raw.startswith("```"):
-        raw = re.sub(r"^```[a-zA-Z]*\s*", "", raw)
-        raw = re.sub(r"\s*```$", "", raw).strip()
-
-    # If the whole thing is JSON, parse directly
-    try:
-        return json.loads(raw)
-    except Exception:
-        pass
-
-    # Fallback: find first JSON object in text
-    m = re.search(r"\{.*\}", raw, flags=re.DOTALL)
-    if not m:
-        raise ValueError("No JSON object found in response")
-
-    candidate = m.group(0)
-    return json.loads(candidate)
+# Structured outputs: the model can only emit an object of this shape, so the
+# reply is parsed directly with no fence-stripping / object-hunting fallbacks.
+SUMMARY_RESPONSE_FORMAT: Dict[str, Any] = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "article_summary",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "summary_bullets": {"type": "array", "items": {"type": "string"}},
+                "key_claims": {"type": "array", "items": {"type": "string"}},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "confidence": {"type": "number"},
+            },
+            "required": ["summary_bullets", "key_claims", "tags", "confidence"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+# Invariant instructions go first, byte-identical on every call, so OpenAI's
+# automatic prompt caching can reuse the prefix across articles.
+SYSTEM_PROMPT = """
+You output strict JSON only.
 
-
-def llm_summarize_json(title: str, url: str, excerpt: str) -> Dict[str, Any]:
-    """
-    Uses Chat Completions. We instruct 'JSON only' and then robustly extract JSON.
-    """
-    prompt = f"""
 Return ONLY valid JSON with keys:
 - summary_bullets: array of 5 strings
 - key_claims: array of 3 strings
@@ -111,113 +111,418 @@ Rules:
 - If excerpt is insufficient, write conservative claims and lower confidence.
 - Keep each bullet/claim under 25 words.
 - No markdown. No commentary. JSON only.
+""".strip()
 
-Title: {title}
-URL: {url}
 
-EXCERPT:
-{excerpt}
-""".strip()
+@lru_cache(maxsize=1)
+def _system_token_count() -> int:
+    return len(get_encoder(MODEL).encode_ordinary(SYSTEM_PROMPT))
 
-    msg = truncate_to_tokens(prompt, MAX_INPUT_TOKENS)
 
-    resp = client.chat.completions.create(
-        model=MODEL,
-        temperature=0.2,
-        max_tokens=MAX_OUTPUT_TOKENS,
-        messages=[
-            {"role": "system", "content": "You output strict JSON only."},
+def _chat_request(title: str, url: str, excerpt: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    (response cache key, chat.completions.create kwargs) for one article.
+    The same body is sent directly or as one line of a Batch API submission.
+    """
+    user = f"Title: {title}\nURL: {url}\n\nEXCERPT:\n{excerpt}"
+
+    # The system prompt counts toward the same input budget
+    msg = truncate_to_tokens(user, max(0, MAX_INPUT_TOKENS - _system_token_count()), MODEL)
+
+    key = cache.make_key(MODEL, PROMPT_VERSION, str(MAX_OUTPUT_TOKENS), msg)
+    body = {
+        "model": MODEL,
+        "temperature": 0.2,
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "response_format": SUMMARY_RESPONSE_FORMAT,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": msg},
         ],
-    )
+    }
+    return key, body
+
 
-    raw = (resp.choices[0].message.content or "").strip()
+def _parse_summary(raw: str) -> Dict[str, Any]:
     try:
-        return _extract_json(raw)
+        return json.loads(raw)
     except Exception:
         print("RAW MODEL OUTPUT (first 500 chars):", raw[:500])
         raise
 
 
-def run(batch_limit: int = BATCH_LIMIT) -> None:
-    pages = query_unprocessed_research(limit=batch_limit)
+async def _complete(key: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    resp = await client.chat.completions.create(**body)
+
+    out = _parse_summary(resp.choices[0].message.content or "")
+    cache.set(key, out)
+    return out
+
+
+async def llm_summarize_json(title: str, url: str, excerpt: str) -> Dict[str, Any]:
+    """
+    Uses Chat Completions with a strict JSON schema (SUMMARY_RESPONSE_FORMAT).
+    Only Title/URL/EXCERPT vary per call; they go in the user message.
+    """
+    return await _complete(*_chat_request(title, url, excerpt))
+
+
+def _bulleted(items: List[str], cap: int = 1900) -> str:
+    """
+    "- item" lines joined by newlines, keeping only whole lines that fit in `cap`
+    chars (a lone oversized first item is cut to fit rather than dropped).
+    """
+    lines: List[str] = []
+    total = 0
+    for item in items:
+        line = f"- {item}"
+        size = len(line) + (1 if lines else 0)
+        if total + size > cap:
+            if not lines:
+                lines.append(line[:cap])
+            break
+        lines.append(line)
+        total += size
+    return "\n".join(lines)
+
+
+def _skip_update(page_id: str) -> Dict[str, Any]:
+    return dict(
+        page_id=page_id,
+        summary="(No URL found; skipped.)",
+        key_claims="",
+        tags=[],
+        usefulness_score=0.0,
+        use_in_draft=False,
+        processed=True,
+    )
+
+
+async def _prepare_page(page: Dict[str, Any], fetch: "asyncio.Future") -> Dict[str, Any]:
+    """
+    Everything before the LLM call for one row: excerpt and chat request. The
+    local score is filled in later for all rows at once by _score_preps.
+    Raises if the page can't be fetched or is too thin to summarize.
+    """
+    title = get_prop_text(page, "Title")
+    url = get_prop_url(page, "URL")
+
+    # Prefetched on the fetch pool; usually done by the time we get here
+    page_title, headings, paragraphs = await fetch
+
+    effective_title = title or page_title or url
+    excerpt = build_excerpt(
+        title=effective_title,
+        headings=headings,
+        paragraphs=paragraphs,
+        keywords=KEYWORDS_LOWER,
+    )
+
+    if len(excerpt) < MIN_EXCERPT_CHARS:
+        raise ValueError(f"Excerpt too short ({len(excerpt)} chars). Likely paywalled/blocked.")
+
+    key, body = _chat_request(effective_title, url, excerpt)
+    return {
+        "page_id": page["id"],
+        "title": effective_title,
+        "excerpt": excerpt,
+        "source": get_prop_select(page, "Source"),
+        "published_iso": get_published_iso(page),
+        "key": key,
+        "body": body,
+    }
+
+
+def _score_preps(preps: List[Dict[str, Any]]) -> None:
+    """
+    Local score (free) for every prepared row in one keyword pass. Replaces the
+    excerpt/source/date inputs with "score" and "matched" so a saved batch job
+    doesn't carry the excerpts.
+    """
+    scores = score_relevance_batch(
+        [p["title"] for p in preps],
+        [p.pop("excerpt") for p in preps],
+        [p.pop("source") for p in preps],
+        [p.pop("published_iso") for p in preps],
+    )
+    for prep, (score, matched) in zip(preps, scores):
+        prep["score"] = score
+        prep["matched"] = matched
+
+
+def _research_update(prep: Dict[str, Any], out: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """
+    (update_research_page kwargs, [OK] log line) from a prepared row and its LLM output.
+    """
+    score = prep["score"]
+    matched = prep["matched"]
+
+    summary_bullets = out.get("summary_bullets", []) or []
+    key_claims = out.get("key_claims", []) or []
+    tags = out.get("tags", []) or (matched[:6] if matched else [])
+    confidence = float(out.get("confidence", 0.5))
+
+    summary = _bulleted(summary_bullets)
+    claims = _bulleted(key_claims)
+
+    use_in_draft = bool(score >= 70.0 and confidence >= 0.6)
+
+    update = dict(
+        page_id=prep["page_id"],
+        summary=summary,
+        key_claims=claims,
+        tags=tags,
+        usefulness_score=score,
+        use_in_draft=use_in_draft,
+        processed=True,
+    )
+    return update, f"[OK] {prep['title'][:70]} | score={score:.1f} conf={confidence:.2f} use={use_in_draft}"
+
+
+def _with_duplicates(update: Dict[str, Any], ok_line: str, duplicate_ids: List[str]) -> List[Tuple[Dict[str, Any], str]]:
+    # The same result copied onto later rows that share the URL
+    return [(update, ok_line)] + [
+        ({**update, "page_id": dup_id}, f"{ok_line} (duplicate url, page_id={dup_id})")
+        for dup_id in duplicate_ids
+    ]
+
+
+async def _process_page(
+    page: Dict[str, Any],
+    fetch: Optional["asyncio.Future"],
+    llm_sem: asyncio.Semaphore,
+) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Fetch + summarize one row. Returns (prepared row, LLM output), or None if the
+    row has no URL or failed and stays unprocessed.
+    """
+    if fetch is None:
+        return None
+
+    try:
+        prep = await _prepare_page(page, fetch)
+
+        # LLM summary (1 call)
+        async with llm_sem:
+            out = await _complete(prep["key"], prep["body"])
+
+        return prep, out
+
+    except Exception as e:
+        print(f"Error:  {get_prop_url(page, 'URL')} -> {e}")
+        return None
+
+
+def _select_pages(batch_limit: int) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]]]:
+    """
+    Up to batch_limit unprocessed rows, minus rows already waiting in a submitted batch.
+    Returns (one row per URL, url -> page ids of later rows with that url).
+    """
+    waiting = {
+        page_id
+        for preps in cache.pending_batches().values()
+        for p in preps
+        for page_id in [p["page_id"], *p["duplicates"]]
+    }
+
+    # Server-side Processed filter, paged with start_cursor; stops after batch_limit rows
+    rows = (p for p in iter_unprocessed_research(page_size=min(100, batch_limit)) if p["id"] not in waiting)
+    pages = list(islice(rows, batch_limit))
+
+    # Rows sharing a URL (the same article ingested from two feeds) are fetched and
+    # summarized once; the result is copied onto each duplicate row.
+    unique: List[Dict[str, Any]] = []
+    duplicates: Dict[str, List[str]] = {}
+    for p in pages:
+        url = get_prop_url(p, "URL")
+        if url and url in duplicates:
+            duplicates[url].append(p["id"])
+            continue
+        if url:
+            duplicates[url] = []
+        unique.append(p)
+    return unique, duplicates
+
+
+async def _with_prefetch(pages: List[Dict[str, Any]], worker) -> List[Any]:
+    """
+    worker(page, fetch) for every page, where fetch is the page's fetch_and_extract
+    future (None without a URL). All fetches are queued up front on their own pool,
+    so later pages' HTML downloads while earlier pages wait on the LLM.
+    """
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        fetches = []
+        for p in pages:
+            url = get_prop_url(p, "URL")
+            fetches.append(loop.run_in_executor(pool, fetch_and_extract, url) if url else None)
+        return await asyncio.gather(*(worker(p, f) for p, f in zip(pages, fetches)))
+
+
+async def _flush_updates(done: List[Tuple[Dict[str, Any], str]]) -> None:
+    # Notion writes are collected and flushed together once the LLM work is done
+    results = await update_research_pages_async([u for u, _ in done]) if done else []
+    for (update, ok_line), err in zip(done, results):
+        if err is not None:
+            print(f"Error:  Notion update failed for page_id={update['page_id']} -> {err}")
+        elif ok_line:
+            print(ok_line)
+
 
-    if not pages:
+async def _arun(batch_limit: int) -> None:
+    unique, duplicates = _select_pages(batch_limit)
+
+    if not unique:
         print("No unprocessed research rows found. Nothing to do.")
         return
 
-    for page in pages:
-        page_id = page["id"]
-        title = get_prop_text(page, "Title")
-        url = get_prop_url(page, "URL")
-        source = get_prop_select(page, "Source")
-        published_iso = get_published_iso(page)
+    # Articles are independent: overlap their fetches and LLM round-trips
+    llm_sem = asyncio.Semaphore(LLM_CONCURRENCY)
+    processed = await _with_prefetch(unique, lambda p, f: _process_page(p, f, llm_sem))
+    _score_preps([prep for prep, _ in filter(None, processed)])
 
+    done = []
+    for p, r in zip(unique, processed):
         # Skip / optionally mark processed if URL is missing
-        if not url:
-            print(f"[SKIP] Missing URL for page_id={page_id} (marking processed)")
-            update_research_page(
-                page_id=page_id,
-                summary="(No URL found; skipped.)",
-                key_claims="",
-                tags=[],
-                usefulness_score=0.0,
-                use_in_draft=False,
-                processed=True,
-            )
-            continue
+        if not get_prop_url(p, "URL"):
+            print(f"[SKIP] Missing URL for page_id={p['id']} (marking processed)")
+            done.append((_skip_update(p["id"]), ""))
+        elif r is not None:
+            done.extend(_with_duplicates(*_research_update(*r), duplicates.get(get_prop_url(p, "URL"), [])))
+    await _flush_updates(done)
 
-        try:
-            html = fetch_html(url)
-            page_title, headings, paragraphs = extract_text_blocks(html)
-
-            effective_title = title or page_title or url
-            excerpt = build_excerpt(
-                title=effective_title,
-                headings=headings,
-                paragraphs=paragraphs,
-                keywords=KEYWORDS,
-            )
-
-            if len(excerpt) < MIN_EXCERPT_CHARS:
-                raise ValueError(f"Excerpt too short ({len(excerpt)} chars). Likely paywalled/blocked.")
-
-            # Local score (free)
-            score, matched = score_relevance(
-                title=effective_title,
-                excerpt=excerpt,
-                source=source,
-                published_iso=published_iso,
-            )
-
-            # LLM summary (1 call)
-            out = llm_summarize_json(effective_title, url, excerpt)
-
-            summary_bullets = out.get("summary_bullets", []) or []
-            key_claims = out.get("key_claims", []) or []
-            tags = out.get("tags", []) or (matched[:6] if matched else [])
-            confidence = float(out.get("confidence", 0.5))
-
-            summary = "\n".join([f"- {b}" for b in summary_bullets])[:1900]
-            claims = "\n".join([f"- {c}" for c in key_claims])[:1900]
-
-            use_in_draft = bool(score >= 70.0 and confidence >= 0.6)
-
-            update_research_page(
-                page_id=page_id,
-                summary=summary,
-                key_claims=claims,
-                tags=tags,
-                usefulness_score=score,
-                use_in_draft=use_in_draft,
-                processed=True,
-            )
-
-            print(f"[OK] {effective_title[:70]} | score={score:.1f} conf={confidence:.2f} use={use_in_draft}")
 
+async def submit_batch(batch_limit: int = BATCH_LIMIT) -> None:
+    """
+    Batch API mode: prepare rows as usual, but send the LLM requests as one
+    /v1/batches job (half-price tokens, no per-request rate limits, results
+    within 24h). Rows whose response is already cached are written right away;
+    apply_batches() writes the rest once the job completes.
+    """
+    unique, duplicates = _select_pages(batch_limit)
+
+    if not unique:
+        print("No unprocessed research rows found. Nothing to do.")
+        return
+
+    async def _prepare(page: Dict[str, Any], fetch: Optional["asyncio.Future"]) -> Optional[Dict[str, Any]]:
+        if fetch is None:
+            return None
+        try:
+            return await _prepare_page(page, fetch)
         except Exception as e:
-            print(f"Error:  {url} -> {e}")
+            print(f"Error:  {get_prop_url(page, 'URL')} -> {e}")
+            return None
+
+    preps = await _with_prefetch(unique, _prepare)
+    _score_preps([prep for prep in preps if prep is not None])
+
+    done = []
+    requests: List[Dict[str, Any]] = []
+    for p, prep in zip(unique, preps):
+        if not get_prop_url(p, "URL"):
+            print(f"[SKIP] Missing URL for page_id={p['id']} (marking processed)")
+            done.append((_skip_update(p["id"]), ""))
+            continue
+        if prep is None:
+            continue
+        prep["duplicates"] = duplicates.get(get_prop_url(p, "URL"), [])
+        cached = cache.get(prep["key"])
+        if cached is not None:
+            done.extend(_with_duplicates(*_research_update(prep, cached), prep["duplicates"]))
+        else:
+            requests.append(prep)
+
+    if requests:
+        lines = [
+            json.dumps({"custom_id": r["page_id"], "method": "POST", "url": "/v1/chat/completions", "body": r["body"]})
+            for r in requests
+        ]
+        batch_file = await client.files.create(
+            file=("summaries.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        # Request bodies live in the uploaded file; keep only what applying needs
+        cache.save_batch(batch.id, [{k: v for k, v in r.items() if k != "body"} for r in requests])
+        print(f"[BATCH] Submitted {batch.id} with {len(requests)} requests")
+
+    await _flush_updates(done)
+
+
+async def apply_batches() -> None:
+    """
+    Write results of completed Batch API jobs to Notion. Jobs still running are
+    left for the next call; rows of failed/expired jobs stay unprocessed and are
+    picked up again by the next run.
+    """
+    pending = cache.pending_batches()
+    if not pending:
+        print("No pending batches.")
+        return
+
+    for batch_id, preps in pending.items():
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+            print(f"[BATCH] {batch_id} still {batch.status}")
+            continue
+        if batch.status != "completed":
+            print(f"[BATCH] {batch_id} ended with status={batch.status}; its rows will be retried")
+            cache.forget_batch(batch_id)
+            continue
+
+        by_page = {p["page_id"]: p for p in preps}
+        done = []
+        if batch.output_file_id:
+            content = await client.files.content(batch.output_file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                prep = by_page.get(item.get("custom_id"))
+                resp = item.get("response") or {}
+                if prep is None or resp.get("status_code") != 200:
+                    print(f"Error:  batch request {item.get('custom_id')} -> {item.get('error') or resp.get('status_code')}")
+                    continue
+                try:
+                    out = _parse_summary(resp["body"]["choices"][0]["message"]["content"] or "")
+                except Exception as e:
+                    print(f"Error:  batch request {item.get('custom_id')} -> {e}")
+                    continue
+                cache.set(prep["key"], out)
+                done.extend(_with_duplicates(*_research_update(prep, out), prep["duplicates"]))
+
+        print(f"[BATCH] {batch_id} completed: {len(done)} updates from {len(preps)} requests")
+        await _flush_updates(done)
+        cache.forget_batch(batch_id)
+
+
+def run(batch_limit: int = BATCH_LIMIT) -> None:
+    asyncio.run(_arun(batch_limit))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize and score unprocessed Research Library rows.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--submit-batch", action="store_true", help="send LLM requests as one OpenAI Batch API job")
+    mode.add_argument("--apply-batches", action="store_true", help="write results of completed batch jobs to Notion")
+    args = parser.parse_args()
+
+    if args.submit_batch:
+        asyncio.run(submit_batch())
+    elif args.apply_batches:
+        asyncio.run(apply_batches())
+    else:
+        run()
 
 
 if __name__ == "__main__":
-    run()
+    main()
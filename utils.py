@@ -1,10 +1,19 @@
 import sqlite3
+import ahocorasick
+import tiktoken
+from bisect import bisect_right
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 def init_dedupe_db(db_path: str) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
+    # WAL + NORMAL: commits no longer fsync the rollback journal each time.
+    # (url is the PRIMARY KEY, so lookups already use its unique index.)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # Temp b-trees for the batched IN lookups stay in memory
+    conn.execute("PRAGMA temp_store=MEMORY")
     cur = conn.cursor()
     cur.execute(
         """CREATE TABLE IF NOT EXISTS seen_urls (
@@ -12,13 +21,28 @@ def init_dedupe_db(db_path: str) -> sqlite3.Connection:
             first_seen_utc TEXT NOT NULL
         )"""
     )
+    cur.execute(
+        """CREATE TABLE IF NOT EXISTS feed_meta (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            modified TEXT
+        )"""
+    )
     conn.commit()
     return conn
 
+def get_feed_meta(conn: sqlite3.Connection) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    # feed url -> (etag, last-modified) from the previous successful run
+    return {url: (etag, modified) for url, etag, modified in conn.execute("SELECT url, etag, modified FROM feed_meta")}
+
+def set_feed_meta_many(conn: sqlite3.Connection, rows: List[Tuple[str, Optional[str], Optional[str]]]) -> None:
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO feed_meta(url, etag, modified) VALUES (?, ?, ?)", rows)
+
 def already_seen(conn: sqlite3.Connection, url: str) -> bool:
-    cur = conn.cursor()
-    cur.execute("SELECT 1 FROM seen_urls WHERE url = ?", (url,))
-    return cur.fetchone() is not None
+    # EXISTS always yields exactly one 0/1 row (url is the PRIMARY KEY, so this is an index probe)
+    (hit,) = conn.execute("SELECT EXISTS(SELECT 1 FROM seen_urls WHERE url = ?)", (url,)).fetchone()
+    return bool(hit)
 
 def mark_seen(conn: sqlite3.Connection, url: str) -> None:
     cur = conn.cursor()
@@ -28,20 +52,154 @@ def mark_seen(conn: sqlite3.Connection, url: str) -> None:
     )
     conn.commit()
 
-def parse_published(entry) -> Optional[datetime]:
+def seen_urls_in(conn: sqlite3.Connection, urls: List[str]) -> set:
+    # One IN query per batch instead of one lookup per URL (900 < SQLite's variable limit)
+    seen = set()
+    unique = list(dict.fromkeys(urls))
+    for i in range(0, len(unique), 900):
+        batch = unique[i:i + 900]
+        placeholders = ",".join("?" * len(batch))
+        rows = conn.execute(f"SELECT url FROM seen_urls WHERE url IN ({placeholders})", batch)
+        seen.update(row[0] for row in rows)
+    return seen
+
+def mark_seen_many(conn: sqlite3.Connection, urls: List[str]) -> None:
+    now = datetime.now(timezone.utc).isoformat()
+    with conn:  # single transaction
+        conn.executemany(
+            "INSERT OR IGNORE INTO seen_urls(url, first_seen_utc) VALUES (?, ?)",
+            [(u, now) for u in urls],
+        )
+
+def published_tuple(entry) -> Optional[Tuple[int, ...]]:
+    # (Y, m, d, H, M, S) in UTC straight from feedparser's struct_time
     published = entry.get("published_parsed") or entry.get("updated_parsed")
     if not published:
         return None
-    return datetime(*published[:6], tzinfo=timezone.utc)
+    return tuple(published[:6])
+
+def parse_published(entry) -> Optional[datetime]:
+    published = published_tuple(entry)
+    if published is None:
+        return None
+    return datetime(*published, tzinfo=timezone.utc)
+
+def recency_cutoff(days: int) -> datetime:
+    # Compute once per batch and compare entries against it
+    return datetime.now(timezone.utc) - timedelta(days=days)
 
 def is_within_days(dt: Optional[datetime], days: int) -> bool:
     if dt is None:
         return False
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    return dt >= cutoff
+    return dt >= recency_cutoff(days)
 
 def safe_text(val: str, max_chars: int) -> str:
     if not val:
         return ""
     val = str(val).strip()
     return val[:max_chars]
+
+@lru_cache(maxsize=4)
+def get_encoder(model: str) -> "tiktoken.Encoding":
+    # encoding_for_model rebuilds the BPE table; build it once per model per process
+    return tiktoken.encoding_for_model(model)
+
+# Generous chars-per-token upper bound for the slice-and-verify path below
+_MAX_CHARS_PER_TOKEN = 6
+
+def truncate_to_tokens(text: str, limit: int, model: str) -> str:
+    # Every token covers at least one UTF-8 byte, so a prompt within the byte
+    # budget is within the token budget and needs no tokenization at all.
+    if len(text.encode("utf-8")) <= limit:
+        return text
+    enc = get_encoder(model)
+    # Encode only a head slice that should hold more than `limit` tokens; the
+    # first `limit` tokens of a long enough prefix match those of the full text.
+    # encode_ordinary skips the special-token scan (and never raises on
+    # "<|endoftext|>"-style text scraped from sources).
+    head = text[: limit * _MAX_CHARS_PER_TOKEN]
+    toks = enc.encode_ordinary(head)
+    if len(toks) <= limit and len(head) < len(text):
+        # Unusually dense text: the slice was too short, fall back to the full text
+        toks = enc.encode_ordinary(text)
+    if len(toks) <= limit:
+        return text
+    return enc.decode(toks[:limit])
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+@lru_cache(maxsize=32)
+def _keyword_automaton(keywords: Tuple[str, ...]) -> Optional["ahocorasick.Automaton"]:
+    # One Aho-Corasick automaton per keyword set: a text is scanned once,
+    # and overlapping keywords ("platform" inside "platform engineering")
+    # are all reported.
+    originals: Dict[str, List[str]] = {}
+    for k in keywords:
+        if k:
+            originals.setdefault(k.lower(), []).append(k)
+    if not originals:
+        return None
+    automaton = ahocorasick.Automaton()
+    for low, kws in originals.items():
+        automaton.add_word(low, (low, tuple(kws)))
+    automaton.make_automaton()
+    return automaton
+
+def _keyword_hits(
+    text_lower: str, automaton: "ahocorasick.Automaton", whole_words: bool = True
+) -> Iterator[Tuple[int, Tuple[str, ...]]]:
+    # (start offset, original keywords) for hits in an already-lowercased text;
+    # with whole_words=False any substring occurrence counts (plain `kw in text`)
+    n = len(text_lower)
+    for end, (low, kws) in automaton.iter(text_lower):
+        start = end - len(low) + 1
+        if not whole_words:
+            yield start, kws
+            continue
+        if start > 0 and _is_word_char(low[0]) and _is_word_char(text_lower[start - 1]):
+            continue
+        if end + 1 < n and _is_word_char(low[-1]) and _is_word_char(text_lower[end + 1]):
+            continue
+        yield start, kws
+
+def has_keyword(text: str, keywords: Iterable[str], whole_words: bool = True) -> bool:
+    automaton = _keyword_automaton(tuple(keywords))
+    if automaton is None or not text:
+        return False
+    return next(_keyword_hits(text.lower(), automaton, whole_words), None) is not None
+
+def find_keywords(text: str, keywords: Iterable[str], whole_words: bool = True) -> List[str]:
+    """
+    Distinct keywords present in text (case-insensitive), in keyword order.
+    whole_words=False matches substrings too ("transformation" in "transformations").
+    """
+    kws = tuple(keywords)
+    automaton = _keyword_automaton(kws)
+    if automaton is None or not text:
+        return []
+    found = set()
+    for _, originals in _keyword_hits(text.lower(), automaton, whole_words):
+        found.update(originals)
+    return [k for k in kws if k in found]
+
+def find_keywords_many(texts: List[str], keywords: Iterable[str], whole_words: bool = True) -> List[List[str]]:
+    """
+    find_keywords for many texts with a single automaton pass over one joined buffer.
+    """
+    kws = tuple(keywords)
+    automaton = _keyword_automaton(kws)
+    if automaton is None:
+        return [[] for _ in texts]
+    lowered = [t.lower() for t in texts]
+    sep = "\n\x1f\n"  # non-word separator: no match can span two rows
+    starts: List[int] = []
+    pos = 0
+    for t in lowered:
+        starts.append(pos)
+        pos += len(t) + len(sep)
+
+    found: List[set] = [set() for _ in texts]
+    for start, originals in _keyword_hits(sep.join(lowered), automaton, whole_words):
+        found[bisect_right(starts, start) - 1].update(originals)
+    return [[k for k in kws if k in f] for f in found]